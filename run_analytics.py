@@ -4,39 +4,53 @@ from src.parsers import load_flow_csv, load_quality_csv
 from src.analytics import (
     flow_daily, flow_shift_aggregates, flow_heatmap_hour_dow,
     quality_daily_compliance, quality_breach_events,
-    seasonal_rollups, humidity_vs_flow_daily
+    seasonal_rollups, humidity_vs_flow_daily, add_time_parts
 )
 
 DATA_DIR = Path("data")
 ART = Path("artifacts"); ART.mkdir(exist_ok=True)
 
+# parquet keeps tz-aware timestamps and categoricals (no re-parse on load); csv if pyarrow is missing
+try:
+    import pyarrow  # noqa: F401
+    HAVE_PARQUET = True
+except ImportError:
+    HAVE_PARQUET = False
+
+def save(df, name: str) -> None:
+    if HAVE_PARQUET:
+        df.to_parquet(ART / f"{name}.parquet", engine="pyarrow", compression="snappy", index=False)
+    else:
+        df.to_csv(ART / f"{name}.csv", index=False)
+
 flow = load_flow_csv(DATA_DIR / "water_flow_data.csv")
 qual = load_quality_csv(DATA_DIR / "water_quality_data.csv")
 
-# flow
-daily = flow_daily(flow)
-shift = flow_shift_aggregates(flow)
-heat  = flow_heatmap_hour_dow(flow)
+# flow (time parts computed once, shared by the three aggregations)
+flow_t = add_time_parts(flow)
+daily = flow_daily(flow_t)
+shift = flow_shift_aggregates(flow_t)
+heat  = flow_heatmap_hour_dow(flow_t)
 
-daily.to_csv(ART / "flow_daily.csv", index=False)
-shift.to_csv(ART / "flow_shift.csv", index=False)
-heat.to_csv(ART / "flow_heatmap_hour_dow.csv")
+save(daily, "flow_daily")
+save(shift, "flow_shift")
+save(heat.rename(columns=str).reset_index(), "flow_heatmap_hour_dow")  # parquet needs str column names
 
 # quality
 comp  = quality_daily_compliance(qual)
 breach= quality_breach_events(qual)
 
-comp.to_csv(ART / "quality_daily_compliance.csv", index=False)
-breach.to_csv(ART / "quality_breach_events.csv", index=False)
+save(comp, "quality_daily_compliance")
+save(breach, "quality_breach_events")
 
 # seasonal
 roll = seasonal_rollups(flow, qual)
-roll["flow_month"].to_csv(ART / "seasonal_flow_month.csv", index=False)
-roll["quality_month"].to_csv(ART / "seasonal_quality_month.csv", index=False)
+save(roll["flow_month"], "seasonal_flow_month")
+save(roll["quality_month"], "seasonal_quality_month")
 
 # weather impact via humidity
 hum_df, corr = humidity_vs_flow_daily(flow, qual, humidity_name="HUMIDITY (HUMIDITY)")
-hum_df.to_csv(ART / "humidity_vs_flow_daily.csv", index=False)
+save(hum_df, "humidity_vs_flow_daily")
 
 print("Saved artifacts to:", ART.resolve())
 print("Files:")
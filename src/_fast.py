@@ -0,0 +1,106 @@
+# src/_fast.py
+from __future__ import annotations
+import numpy as np
+
+# numba is optional; callers fall back to pandas when it is missing
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+HAVE_NUMBA = njit is not None
+
+def _sorted_insert(buf: np.ndarray, n: int, v: float) -> int:
+    i = np.searchsorted(buf[:n], v)
+    buf[i + 1:n + 1] = buf[i:n].copy()
+    buf[i] = v
+    return n + 1
+
+def _sorted_remove(buf: np.ndarray, n: int, v: float) -> int:
+    i = np.searchsorted(buf[:n], v)
+    buf[i:n - 1] = buf[i + 1:n].copy()
+    return n - 1
+
+def _median(buf: np.ndarray, n: int) -> float:
+    h = n // 2
+    return buf[h] if n % 2 else 0.5 * (buf[h - 1] + buf[h])
+
+def _rolling_median_mad(x: np.ndarray, w: int, minp: int):
+    """
+    rolling median of x and rolling median of |x - median| in one pass;
+    same semantics as two chained pandas rolling(w, min_periods=minp).median() calls
+    """
+    n = len(x)
+    med = np.full(n, np.nan)
+    mad = np.full(n, np.nan)
+    res = np.full(n, np.nan)
+    xs = np.empty(w)  # sorted non-nan values in the window
+    rs = np.empty(w)  # sorted non-nan residuals in the window
+    nx = 0
+    nr = 0
+    for i in range(n):
+        if i >= w and not np.isnan(x[i - w]):
+            nx = _sorted_remove(xs, nx, x[i - w])
+        if not np.isnan(x[i]):
+            nx = _sorted_insert(xs, nx, x[i])
+        if nx >= minp:
+            med[i] = _median(xs, nx)
+        res[i] = abs(x[i] - med[i])
+
+        if i >= w and not np.isnan(res[i - w]):
+            nr = _sorted_remove(rs, nr, res[i - w])
+        if not np.isnan(res[i]):
+            nr = _sorted_insert(rs, nr, res[i])
+        if nr >= minp:
+            mad[i] = _median(rs, nr)
+    return med, mad
+
+if HAVE_NUMBA:
+    _sorted_insert = njit(cache=True)(_sorted_insert)
+    _sorted_remove = njit(cache=True)(_sorted_remove)
+    _median = njit(cache=True)(_median)
+    rolling_median_mad = njit(cache=True)(_rolling_median_mad)
+else:
+    rolling_median_mad = None
+
+# numexpr is optional too; it fuses both comparisons and the AND into one pass
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+def in_range(value: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """lo <= value <= hi elementwise (nan -> False)"""
+    if ne is not None:
+        return ne.evaluate("(value >= lo) & (value <= hi)", local_dict={"value": value, "lo": lo, "hi": hi})
+    return (value >= lo) & (value <= hi)
+
+def in_range_mask(q) -> np.ndarray:
+    """in-range mask for a quality frame; reuses the loader's in_range column when present"""
+    if "in_range" in q.columns:
+        return q["in_range"].to_numpy(dtype=bool)
+    return in_range(*(q[c].to_numpy(dtype=float) for c in ("value", "safe_min", "safe_max")))
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out points (first and last kept)
+    that preserve the visual shape of the series; used to downsample before plotting
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:nhi].mean()
+        avg_y = y[hi:nhi].mean()
+        # twice the triangle area (a, candidate, next-bucket average)
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        idx[i + 1] = a
+    return idx
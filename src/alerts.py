@@ -3,15 +3,29 @@ from __future__ import annotations
 import pandas as pd
 import numpy as np
 
+from ._fast import HAVE_NUMBA, in_range_mask, rolling_median_mad
+
 def flow_anomalies(flow: pd.DataFrame, window: int = 24) -> pd.DataFrame:
     """
     flag spikes using rolling median + mad; window is number of readings (5-min each; 24 ≈ 2 hours)
     """
     z = flow.sort_values("timestamp").copy()
-    z["roll_med"] = z["consumption"].rolling(window, min_periods=max(6, window//4)).median()
-    mad = (z["consumption"] - z["roll_med"]).abs().rolling(window, min_periods=max(6, window//4)).median()
-    z["threshold"] = z["roll_med"] + 3.0 * mad.replace(0, np.nan)
-    z["anomaly"] = z["consumption"] > z["threshold"]
+    minp = max(6, window//4)
+    if HAVE_NUMBA:
+        # fused median + mad in one jitted pass
+        med, mad = rolling_median_mad(z["consumption"].to_numpy(dtype=np.float64), window, minp)
+    else:
+        roll_med = z["consumption"].rolling(window, min_periods=minp).median()
+        med = roll_med.to_numpy()
+        mad = (z["consumption"] - roll_med).abs().rolling(window, min_periods=minp).median().to_numpy()
+    # medians are computed in float64; stored in the column's dtype so float32 input exports clean values.
+    # the flag compares against that stored threshold; med + 3*mad built from rounded inputs carries a few
+    # ulps of error, so a reading within that of the threshold is a tie at the stored precision, not a spike
+    dt = z["consumption"].dtype
+    thr = (med + 3.0 * np.where(mad == 0, np.nan, mad)).astype(dt)
+    z["anomaly"] = z["consumption"].to_numpy() > thr + 4 * np.spacing(thr)
+    z["roll_med"] = np.asarray(med).astype(dt)
+    z["threshold"] = thr
     return z[["timestamp","consumption","roll_med","threshold","anomaly"]]
 
 def quality_latest_breaches(quality: pd.DataFrame) -> pd.DataFrame:
@@ -22,9 +36,8 @@ def quality_latest_breaches(quality: pd.DataFrame) -> pd.DataFrame:
         return quality.copy()
     end = quality["timestamp"].max()
     start = end - pd.Timedelta(hours=24)
-    q = quality[(quality["timestamp"] >= start) & (quality["timestamp"] <= end)].copy()
-    q["in_range"] = (q["value"] >= q["safe_min"]) & (q["value"] <= q["safe_max"])
-    breaches = q[~q["in_range"]].sort_values(["parameter","timestamp"])
+    q = quality[(quality["timestamp"] >= start) & (quality["timestamp"] <= end)]
+    breaches = q[~in_range_mask(q)].sort_values(["parameter","timestamp"])
     return breaches[["timestamp","parameter","value","safe_min","safe_max"]]
 
 def simple_recommendations(quality_breaches: pd.DataFrame) -> list[str]:
@@ -34,15 +47,23 @@ def simple_recommendations(quality_breaches: pd.DataFrame) -> list[str]:
     tips = []
     if quality_breaches.empty:
         return ["All parameters within safe ranges in the last 24h."]
-    params = set(quality_breaches["parameter"].unique())
-    if any("TDS" in p for p in params):
+    # one pass over the breached parameters sets every flag
+    tds = ph = tss = bod = hum = False
+    for p in quality_breaches["parameter"].unique():
+        p = str(p)
+        tds = tds or "TDS" in p
+        ph = ph or "(pH" in p or "pH)" in p
+        tss = tss or "TSS" in p or "Turb" in p
+        bod = bod or "BOD" in p or "COD" in p
+        hum = hum or "HUMIDITY" in p
+    if tds:
         tips.append("High TDS detected → check RO/softener status, resin condition, and source blend.")
-    if any("(pH" in p or "pH)" in p or p.endswith("(pH)") for p in params):
+    if ph:
         tips.append("pH out of range → verify dosing pumps (alkali/acid), probe calibration, and tank mixing.")
-    if any("TSS" in p or "Turb" in p for p in params):
+    if tss:
         tips.append("Suspended solids/turbidity ↑ → inspect filters/backwash cycles and upstream settling.")
-    if any("BOD" in p or "COD" in p for p in params):
+    if bod:
         tips.append("BOD/COD breaches → check biological treatment load, aeration, and recycle ratios.")
-    if any("HUMIDITY" in p for p in params):
+    if hum:
         tips.append("Humidity spikes → consider ventilation/conditioning; correlate with usage peaks.")
     return tips
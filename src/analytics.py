@@ -1,143 +1,186 @@
-# src/analytics.py
-from __future__ import annotations
-import numpy as np
-import pandas as pd
-from typing import Dict, Tuple
-
-SHIFT_DEF = [
-    ("Shift A", 6, 14),   # 06:00–14:00
-    ("Shift B", 14, 22),  # 14:00–22:00
-    ("Shift C", 22, 6),   # 22:00–06:00 (overnight)
-]
-
-def _add_time_parts(df: pd.DataFrame) -> pd.DataFrame:
-    z = df.copy()
-    z["date"] = z["timestamp"].dt.date
-    z["hour"] = z["timestamp"].dt.hour
-    z["dow"]  = z["timestamp"].dt.dayofweek  # 0=mon
-    z["month"]= z["timestamp"].dt.month
-    return z
-
-def _hour_to_shift(h: int) -> str:
-    for name, start, end in SHIFT_DEF:
-        if start < end:
-            if start <= h < end:
-                return name
-        else:
-            # overnight window
-            if h >= start or h < end:
-                return name
-    return "Unknown"
-
-# flow
-def flow_daily(flow: pd.DataFrame) -> pd.DataFrame:
-    """Daily totals and basic stats."""
-    z = _add_time_parts(flow)
-    g = z.groupby("date", as_index=False).agg(
-        total_consumption=("consumption", "sum"),
-        mean_interval=("consumption", "mean"),
-        p95_interval=("consumption", lambda s: float(np.nanpercentile(s, 95)) if len(s) else np.nan),
-        readings=("consumption", "size"),
-    )
-    return g.sort_values("date")
-
-def flow_shift_aggregates(flow: pd.DataFrame) -> pd.DataFrame:
-    z = _add_time_parts(flow)
-    z["shift"] = z["hour"].apply(_hour_to_shift)
-    g = z.groupby(["date", "shift"], as_index=False).agg(
-        total_consumption=("consumption", "sum"),
-        readings=("consumption", "size"),
-    )
-    return g.sort_values(["date", "shift"])
-
-def flow_heatmap_hour_dow(flow: pd.DataFrame) -> pd.DataFrame:
-    """Mean consumption by hour-of-day vs day-of-week (pivot)."""
-    z = _add_time_parts(flow)
-    heat = z.groupby(["dow","hour"], as_index=False)["consumption"].mean()
-    return heat.pivot(index="dow", columns="hour", values="consumption").sort_index()
-
-# quality
-def quality_daily_compliance(quality: pd.DataFrame) -> pd.DataFrame:
-    """% in safe range per parameter per day (+ basic stats)."""
-    q = quality.copy()
-    q["in_range"] = (q["value"] >= q["safe_min"]) & (q["value"] <= q["safe_max"])
-    q["date"] = q["timestamp"].dt.date
-    g = q.groupby(["parameter","date"], as_index=False).agg(
-        pct_in_range=("in_range", lambda s: 100.0 * s.mean() if len(s) else np.nan),
-        breaches=("in_range", lambda s: int((~s).sum())),
-        readings=("in_range","size"),
-        avg_value=("value","mean"),
-        min_value=("value","min"),
-        max_value=("value","max"),
-    )
-    return g.sort_values(["parameter","date"])
-
-def quality_breach_events(quality: pd.DataFrame) -> pd.DataFrame:
-    """Consecutive out-of-range segments per parameter with duration.
-    Returns an empty DataFrame with proper columns if there are no breaches.
-    """
-    q = quality.sort_values(["parameter","timestamp"]).copy()
-    q["in_range"] = (q["value"] >= q["safe_min"]) & (q["value"] <= q["safe_max"])
-
-    rows = []
-    for param, g in q.groupby("parameter"):
-        g = g.reset_index(drop=True)
-        run_id = (g["in_range"] != g["in_range"].shift(1)).cumsum()
-        for _, seg in g.groupby(run_id):
-            if not seg.empty and (seg["in_range"].iloc[0] is False):
-                start = seg["timestamp"].iloc[0]
-                end   = seg["timestamp"].iloc[-1]
-                dur_min = (end - start).total_seconds() / 60.0
-                rows.append({
-                    "parameter": param,
-                    "start": start,
-                    "end": end,
-                    "duration_min": round(dur_min, 2),
-                    "min_value": float(seg["value"].min()),
-                    "max_value": float(seg["value"].max()),
-                    "readings": int(len(seg)),
-                })
-
-    cols = ["parameter","start","end","duration_min","min_value","max_value","readings"]
-    if not rows:
-        return pd.DataFrame(columns=cols)
-
-    return pd.DataFrame(rows, columns=cols).sort_values(["parameter","start"])
-
-# seasonal and humidity impact
-def seasonal_rollups(flow: pd.DataFrame, quality: pd.DataFrame) -> Dict[str, pd.DataFrame]:
-    """Monthly flow totals and monthly %in-range by parameter."""
-    f = flow.copy()
-    q = quality.copy()
-
-    f["month"] = f["timestamp"].dt.month
-    flow_month = f.groupby("month", as_index=False)["consumption"].sum().rename(columns={"consumption":"total_consumption"})
-
-    q["in_range"] = (q["value"] >= q["safe_min"]) & (q["value"] <= q["safe_max"])
-    q["month"] = q["timestamp"].dt.month
-    qual_month = (q.groupby(["parameter","month"], as_index=False)["in_range"].mean()
-                    .rename(columns={"in_range":"mean_in_range"}))
-    qual_month["pct_in_range"] = 100.0 * qual_month["mean_in_range"]
-    qual_month = qual_month.drop(columns=["mean_in_range"])
-
-    return {"flow_month": flow_month, "quality_month": qual_month}
-
-def humidity_vs_flow_daily(flow: pd.DataFrame, quality: pd.DataFrame, humidity_name: str = "HUMIDITY (HUMIDITY)") -> Tuple[pd.DataFrame, float | None]:
-    """Daily total consumption vs daily mean humidity; returns merged df and Pearson corr."""
-    # daily flow
-    fd = flow_daily(flow).rename(columns={"date":"date_flow"})
-    fd["date"] = pd.to_datetime(fd["date_flow"]).dt.date
-
-    # daily humidity
-    h = quality[quality["parameter"] == humidity_name].copy()
-    if h.empty:
-        return pd.DataFrame(columns=["date","total_consumption","humidity"]), None
-    h["date"] = h["timestamp"].dt.date
-    hd = h.groupby("date", as_index=False)["value"].mean().rename(columns={"value":"humidity"})
-
-    # join on date
-    merged = pd.merge(fd[["date","total_consumption"]], hd, on="date", how="inner")
-    corr = None
-    if len(merged) >= 2 and merged["humidity"].notna().any():
-        corr = float(merged["total_consumption"].corr(merged["humidity"]))
-    return merged, corr
+# src/analytics.py
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+from ._fast import in_range_mask
+
+SHIFT_DEF = [
+    ("Shift A", 6, 14),   # 06:00–14:00
+    ("Shift B", 14, 22),  # 14:00–22:00
+    ("Shift C", 22, 6),   # 22:00–06:00 (overnight)
+]
+
+TIME_PARTS = ("day", "hour", "dow", "month")
+
+def _local_wall(ts: pd.Series) -> np.ndarray:
+    """Naive datetime64 array of local wall-clock time (tz dropped, not converted)."""
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_localize(None)
+    return ts.to_numpy()
+
+def _time_arrays(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(day, hour, dow, month) int arrays from local wall time; day = days since epoch.
+    Reuses the columns if the caller already ran add_time_parts; never copies the frame.
+    """
+    if all(c in df.columns for c in TIME_PARTS):
+        return tuple(df[c].to_numpy() for c in TIME_PARTS)
+    local = _local_wall(df["timestamp"])
+    day = local.astype("datetime64[D]")
+    day_i8 = day.view("i8")
+    hour = ((local - day) // np.timedelta64(1, "h")).astype(np.int8)
+    dow = ((day_i8 + 3) % 7).astype(np.int8)  # 0=mon (epoch was a thursday)
+    month = (day.astype("datetime64[M]").view("i8") % 12 + 1).astype(np.int8)
+    return day_i8.astype(np.int32), hour, dow, month
+
+def add_time_parts(df: pd.DataFrame) -> pd.DataFrame:
+    """df plus day/hour/dow/month columns (see TIME_PARTS), computed once by the caller.
+    Every aggregation here reads time parts through _time_arrays, which reuses these columns
+    instead of recomputing them from the timestamp.
+    """
+    return df.assign(**dict(zip(TIME_PARTS, _time_arrays(df))))
+
+def _day_to_date(day) -> np.ndarray:
+    """Epoch-day buckets back to datetime.date objects for display."""
+    return np.asarray(day, dtype="i8").astype("datetime64[D]").astype(object)
+
+def _hour_to_shift(h: int) -> str:
+    for name, start, end in SHIFT_DEF:
+        if start < end:
+            if start <= h < end:
+                return name
+        else:
+            # overnight window
+            if h >= start or h < end:
+                return name
+    return "Unknown"
+
+# hour -> shift code lookup, built once from SHIFT_DEF
+_SHIFT_NAMES = [name for name, _, _ in SHIFT_DEF] + ["Unknown"]
+_SHIFT_BY_HOUR = np.array([_SHIFT_NAMES.index(_hour_to_shift(h)) for h in range(24)], dtype=np.int8)
+
+def _f64(s: pd.Series) -> pd.Series:
+    """Values are stored as float32; sums and means accumulate in float64 so long series don't drift."""
+    return s.astype(np.float64, copy=False)
+
+# flow
+def flow_daily(flow: pd.DataFrame) -> pd.DataFrame:
+    """Daily totals and basic stats."""
+    day, _, _, _ = _time_arrays(flow)
+    g = _f64(flow["consumption"]).groupby(day).agg(total_consumption="sum", mean_interval="mean", readings="size")
+    # cython groupby quantile (skips nan, linear interp like np.percentile)
+    # quantile computes in float64; back to the column's dtype so float32 input doesn't export widening noise
+    g.insert(2, "p95_interval", flow["consumption"].groupby(day).quantile(0.95).astype(flow["consumption"].dtype))
+    g.insert(0, "date", _day_to_date(g.index))
+    return g.reset_index(drop=True)
+
+def flow_shift_aggregates(flow: pd.DataFrame) -> pd.DataFrame:
+    day, hour, _, _ = _time_arrays(flow)
+    shift = pd.Categorical.from_codes(_SHIFT_BY_HOUR[hour], categories=_SHIFT_NAMES)
+    g = (_f64(flow["consumption"]).groupby([day, shift], observed=True)
+           .agg(total_consumption="sum", readings="size")
+           .rename_axis(["day", "shift"]).reset_index())
+    g.insert(0, "date", _day_to_date(g.pop("day")))
+    return g
+
+def flow_heatmap_hour_dow(flow: pd.DataFrame) -> pd.DataFrame:
+    """Mean consumption by hour-of-day vs day-of-week (pivot)."""
+    _, hour, dow, _ = _time_arrays(flow)
+    heat = _f64(flow["consumption"]).groupby([dow, hour]).mean().rename_axis(["dow", "hour"])
+    return heat.unstack("hour").sort_index()
+
+# quality
+def quality_daily_compliance(quality: pd.DataFrame) -> pd.DataFrame:
+    """% in safe range per parameter per day (+ basic stats)."""
+    q = quality.copy()
+    q["in_range"] = in_range_mask(q)
+    q["out_of_range"] = (~q["in_range"]).astype(int)
+    q["date"] = _time_arrays(q)[0]  # int day bucket; real dates restored after grouping
+    q["value64"] = _f64(q["value"])
+    # plain reductions only, so every column stays on the cython groupby path
+    g = q.groupby(["parameter","date"], as_index=False, observed=True).agg(
+        pct_in_range=("in_range","mean"),
+        breaches=("out_of_range","sum"),
+        readings=("in_range","size"),
+        avg_value=("value64","mean"),
+        min_value=("value","min"),
+        max_value=("value","max"),
+    )
+    g["pct_in_range"] *= 100.0
+    g["date"] = _day_to_date(g["date"])
+    return g.sort_values(["parameter","date"])
+
+def quality_breach_events(quality: pd.DataFrame) -> pd.DataFrame:
+    """Consecutive out-of-range segments per parameter with duration.
+    Returns an empty DataFrame with proper columns if there are no breaches.
+    """
+    cols = ["parameter","start","end","duration_min","min_value","max_value","readings"]
+    q = quality.sort_values(["parameter","timestamp"]).reset_index(drop=True)
+    if q.empty:
+        return pd.DataFrame(columns=cols)
+
+    val = q["value"].to_numpy()  # column's own dtype (float32 from the loader)
+    param = q["parameter"]
+    # compare int codes rather than strings when parameter is categorical
+    pkey = param.cat.codes.to_numpy() if isinstance(param.dtype, pd.CategoricalDtype) else param.to_numpy()
+    ir = in_range_mask(q)
+
+    # a segment starts wherever the parameter changes or in_range flips
+    bnd = np.flatnonzero(np.r_[True, (pkey[1:] != pkey[:-1]) | (ir[1:] != ir[:-1])])
+    last = np.r_[bnd[1:], len(val)] - 1
+    # fmin/fmax skip nan like pandas min/max
+    seg_min = np.fmin.reduceat(val, bnd)
+    seg_max = np.fmax.reduceat(val, bnd)
+    seg_len = np.diff(np.r_[bnd, len(val)])
+
+    keep = ~ir[bnd]
+    if not keep.any():
+        return pd.DataFrame(columns=cols)
+
+    start = q["timestamp"].iloc[bnd[keep]].reset_index(drop=True)
+    end = q["timestamp"].iloc[last[keep]].reset_index(drop=True)
+    return pd.DataFrame({
+        "parameter": param.iloc[bnd[keep]].array,
+        "start": start,
+        "end": end,
+        "duration_min": ((end - start).dt.total_seconds() / 60.0).round(2),
+        "min_value": seg_min[keep],
+        "max_value": seg_max[keep],
+        "readings": seg_len[keep].astype(int),
+    }, columns=cols)
+
+# seasonal and humidity impact
+def seasonal_rollups(flow: pd.DataFrame, quality: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Monthly flow totals and monthly %in-range by parameter."""
+    f_month = _time_arrays(flow)[3]
+    flow_month = (_f64(flow["consumption"]).groupby(f_month).sum()
+                    .rename_axis("month").rename("total_consumption").reset_index())
+
+    q_month = _time_arrays(quality)[3]
+    in_range = pd.Series(in_range_mask(quality), index=quality.index)
+    qual_month = (in_range.groupby([quality["parameter"], q_month], observed=True).mean()
+                    .rename_axis(["parameter","month"]).rename("pct_in_range").reset_index())
+    qual_month["pct_in_range"] *= 100.0
+
+    return {"flow_month": flow_month, "quality_month": qual_month}
+
+def humidity_vs_flow_daily(flow: pd.DataFrame, quality: pd.DataFrame, humidity_name: str = "HUMIDITY (HUMIDITY)") -> Tuple[pd.DataFrame, float | None]:
+    """Daily total consumption vs daily mean humidity; returns merged df and Pearson corr."""
+    # daily humidity
+    h = quality[quality["parameter"] == humidity_name]
+    if h.empty:
+        return pd.DataFrame(columns=["date","total_consumption","humidity"]), None
+    hd = _f64(h["value"]).groupby(_local_wall(h["timestamp"]).astype("datetime64[D]")).mean().rename("humidity")
+
+    # daily flow: only the total is needed, so skip flow_daily's extra stats
+    fd = (_f64(flow["consumption"]).groupby(_local_wall(flow["timestamp"]).astype("datetime64[D]")).sum()
+            .rename("total_consumption"))
+
+    # both are indexed by sorted datetime64 days: align on the index instead of a hash merge
+    merged = (pd.concat([fd, hd], axis=1, join="inner").sort_index()
+                .rename_axis("date").reset_index())
+    corr = None
+    if len(merged) >= 2 and merged["humidity"].notna().any():
+        corr = float(merged["total_consumption"].corr(merged["humidity"]))
+    return merged, corr
@@ -1,11 +1,20 @@
 # src/ask.py
 from __future__ import annotations
-import os, requests, json
+import asyncio, os, re, requests, json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Iterator
 
 # read env vars for ollama
 OLLAMA_URL   = os.environ.get("OLLAMA_URL", "http://127.0.0.1:11435/api/chat")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.1")
 
+# shared keep-alive session so repeated calls reuse pooled connections.
+# retries are mounted on the chat endpoint only; the health probe must fail fast
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.3))
+_SESSION.mount(OLLAMA_URL, _adapter)
+
 class OllamaUnavailable(RuntimeError):
     pass
 
@@ -13,17 +22,20 @@ def ensure_ollama_available() -> dict:
     """fail fast if ollama server isn't reachable"""
     # derive base from ollama_url
     base = OLLAMA_URL.split("/api/")[0]
-    r = requests.get(f"{base}/api/version", timeout=10)
+    # single attempt, short timeout (no retry adapter on this url)
+    r = _SESSION.get(f"{base}/api/version", timeout=3)
     r.raise_for_status()
     return r.json()
 
+_ASK_SYSTEM = (
+    "You are an AI assistant in a water analytics app. "
+    "Be concise. If asked for insights, summarize clearly."
+)
+
 def ask_ollama(prompt: str, system: str | None = None) -> str:
     """plain q&a call to ollama"""
     if system is None:
-        system = (
-            "You are an AI assistant in a water analytics app. "
-            "Be concise. If asked for insights, summarize clearly."
-        )
+        system = _ASK_SYSTEM
     payload = {
         "model": OLLAMA_MODEL,
         "messages": [
@@ -32,30 +44,59 @@ def ask_ollama(prompt: str, system: str | None = None) -> str:
         ],
         "stream": False
     }
-    r = requests.post(OLLAMA_URL, json=payload, timeout=120)
+    r = _SESSION.post(OLLAMA_URL, json=payload, timeout=120)
     r.raise_for_status()
     data = r.json()
     # prefer 'message.content'; fallback to 'response'
     return (data.get("message") or {}).get("content") or data.get("response") or ""
 
-import json, re
+def ask_ollama_stream(prompt: str, system: str | None = None) -> Iterator[str]:
+    """like ask_ollama, but yields reply chunks as they arrive (ollama streams ndjson, one object per line)"""
+    payload = {
+        "model": OLLAMA_MODEL,
+        "messages": [
+            {"role":"system","content": system if system is not None else _ASK_SYSTEM},
+            {"role":"user","content": prompt}
+        ],
+        "stream": True
+    }
+    with _SESSION.post(OLLAMA_URL, json=payload, timeout=120, stream=True) as r:
+        r.raise_for_status()
+        # chunk_size=None: hand over whatever has arrived instead of waiting to fill a 512-byte buffer
+        for line in r.iter_lines(chunk_size=None):
+            if not line:
+                continue
+            data = json.loads(line)
+            if "error" in data:
+                raise RuntimeError(data["error"])
+            chunk = (data.get("message") or {}).get("content") or data.get("response") or ""
+            if chunk:
+                yield chunk
+            if data.get("done"):
+                break
+
+_FENCE_RE = re.compile(r"^```(?:json)?|```$", re.IGNORECASE | re.MULTILINE)
+_DECODER = json.JSONDecoder()
 
 def _safe_json_extract(s: str) -> dict:
     """extract first json object from text; return {} on failure"""
     if not isinstance(s, str):
         return {}
-    # remove optional code fences
+    # remove optional code fences (cheap check first; most replies have none)
     s = s.strip()
-    s = re.sub(r"^```(?:json)?|```$", "", s.strip(), flags=re.IGNORECASE | re.MULTILINE)
-    # find brace bounds
-    m_start = s.find("{")
-    m_end = s.rfind("}")
-    if m_start == -1 or m_end == -1 or m_end <= m_start:
-        return {}
-    try:
-        return json.loads(s[m_start:m_end+1])
-    except Exception:
-        return {}
+    if "```" in s:
+        s = _FENCE_RE.sub("", s)
+    # decode from each '{' in turn; raw_decode stops at the end of the object
+    idx = s.find("{")
+    while idx != -1:
+        try:
+            obj, _ = _DECODER.raw_decode(s, idx)
+            if isinstance(obj, dict):
+                return obj
+        except ValueError:
+            pass
+        idx = s.find("{", idx + 1)
+    return {}
 
 def plan_query(query: str) -> dict:
     """return compact json plan describing which analytic to run"""
@@ -80,7 +121,7 @@ def plan_query(query: str) -> dict:
         ],
         "stream": False
     }
-    r = requests.post(OLLAMA_URL, json=payload, timeout=120)
+    r = _SESSION.post(OLLAMA_URL, json=payload, timeout=120)
     r.raise_for_status()
     data = r.json()
     text = (data.get("message") or {}).get("content") or data.get("response") or ""
@@ -93,3 +134,13 @@ def plan_query(query: str) -> dict:
     if not isinstance(plan["params"], dict):
         plan["params"] = {}
     return plan
+
+# async variants: the blocking call runs in a worker thread, so callers can
+# asyncio.gather() an llm round-trip with local analytics or other prompts
+async def ask_ollama_async(prompt: str, system: str | None = None) -> str:
+    """async ask_ollama"""
+    return await asyncio.to_thread(ask_ollama, prompt, system)
+
+async def plan_query_async(query: str) -> dict:
+    """async plan_query"""
+    return await asyncio.to_thread(plan_query, query)
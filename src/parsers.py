@@ -2,56 +2,99 @@
 from __future__ import annotations
 import re
 from pathlib import Path
-from typing import Tuple, Optional
 import pandas as pd
 import numpy as np
 
+from ._fast import in_range
+
+# pyarrow is optional; its multithreaded csv reader is used when installed
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pacsv = None
+
+# arrow-backed strings with numpy-style nan semantics (pandas 3's default "str");
+# pandas < 2.3 spells it "pyarrow_numpy"
+if pacsv is not None:
+    try:
+        _ARROW_STR = pd.StringDtype("pyarrow", na_value=np.nan)
+    except TypeError:
+        _ARROW_STR = pd.StringDtype("pyarrow_numpy")
+
 TZ = "Asia/Kolkata"
 
+def _empty(**dtypes) -> pd.DataFrame:
+    """zero-row frame with real dtypes, so the time-part/analytics code runs on it unchanged"""
+    return pd.DataFrame({c: pd.Series(dtype=t) for c, t in dtypes.items()})
+
+def _read_raw_csv(path: Path | str, ncols: int = 3) -> pd.DataFrame:
+    """
+    First `ncols` columns of a raw log as strings ("" for empty cells).
+    No header inference: these files carry their own header rows inside the data.
+    """
+    if pacsv is not None:
+        names = [f"f{i}" for i in range(ncols)]
+        try:
+            tbl = pacsv.read_csv(
+                path,
+                read_options=pacsv.ReadOptions(autogenerate_column_names=True),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=names, column_types={c: pa.string() for c in names}
+                ),
+            )
+        except pa.ArrowInvalid:
+            # pyarrow rejects ragged rows (uneven trailing commas in hand-exported logs);
+            # pd.read_csv pads them with nan, so let it handle those files
+            tbl = None
+        if tbl is not None:
+            # keep the cells in arrow buffers: the str.* passes below then run as arrow kernels
+            return tbl.to_pandas(types_mapper={pa.string(): _ARROW_STR}.get).fillna("")
+    return pd.read_csv(path, dtype=str, header=None, usecols=range(ncols)).fillna("")
+
+def _parse_timestamps(date: pd.Series, time: pd.Series) -> pd.Series:
+    """
+    Vectorized 'dd/mm/yyyy HH:MM:SS' -> tz-aware timestamps (NaT on failure).
+    Logs repeat the same date strings constantly, so unique strings are parsed once (cache=True).
+    """
+    ts = pd.to_datetime(date + " " + time, dayfirst=True, errors="coerce", cache=True)
+    return ts.dt.tz_localize(TZ, nonexistent="shift_forward", ambiguous="NaT")
+
 # flow parser
 def load_flow_csv(path: Path | str) -> pd.DataFrame:
     """
     Flow CSV has repeating header blocks ("Date | Time | Totalizer").
-    Returns tidy DataFrame: [timestamp (tz-aware), totalizer (float), consumption (float)]
+    Returns tidy DataFrame sorted by timestamp: [timestamp (tz-aware), totalizer (float), consumption (float32)]
     """
-    raw = pd.read_csv(path, dtype=str).fillna("")
+    raw = _read_raw_csv(path)
+    # strip every cell once up front
+    cells = pd.DataFrame({
+        "date": raw.iloc[:, 0].str.strip(),
+        "time": raw.iloc[:, 1].str.strip(),
+        "totalizer": raw.iloc[:, 2].str.strip(),
+    })
     # identify header rows
     is_header = (
-        (raw.iloc[:, 0].str.strip().str.lower() == "date")
-        & (raw.iloc[:, 1].str.strip().str.lower() == "time")
-        & (raw.iloc[:, 2].str.strip().str.lower().str.contains("totalizer"))
+        (cells["date"].str.lower() == "date")
+        & (cells["time"].str.lower() == "time")
+        & (cells["totalizer"].str.lower().str.contains("totalizer"))
     )
-    header_idxs = list(raw[is_header].index) + [len(raw)]
-
-    blocks = []
-    for i in range(len(header_idxs) - 1):
-        start = header_idxs[i] + 1
-        end = header_idxs[i + 1]
-        if start >= end:
-            continue
-        block = raw.iloc[start:end, :3].copy()
-        block.columns = ["date", "time", "totalizer"]
-        # keep rows with all three fields
-        block = block[
-            (block["date"].str.strip() != "")
-            & (block["time"].str.strip() != "")
-            & (block["totalizer"].str.strip() != "")
-        ]
-        # parse types
-        ts = pd.to_datetime(
-            block["date"].str.strip() + " " + block["time"].str.strip(),
-            dayfirst=True, errors="coerce"
-        )
-        block["timestamp"] = ts.dt.tz_localize(TZ, nonexistent="shift_forward", ambiguous="NaT")
-        block["totalizer"] = pd.to_numeric(block["totalizer"].str.replace(",", ""), errors="coerce")
-        block = block.dropna(subset=["timestamp", "totalizer"]).sort_values("timestamp")
-        blocks.append(block[["timestamp", "totalizer"]])
-
-    if not blocks:
-        return pd.DataFrame(columns=["timestamp", "totalizer", "consumption"])
-
+    # data rows: anything after the first header that isn't a header and has all three fields
+    keep = (
+        (is_header.cumsum() > 0) & ~is_header
+        & (cells["date"] != "") & (cells["time"] != "") & (cells["totalizer"] != "")
+    )
+    if not keep.any():
+        return _empty(timestamp=f"datetime64[ns, {TZ}]", totalizer=np.float64, consumption=np.float32)
+
+    # parse every block in one pass
+    sub = cells[keep]
+    df = pd.DataFrame({
+        "timestamp": _parse_timestamps(sub["date"], sub["time"]),
+        "totalizer": pd.to_numeric(sub["totalizer"].str.replace(",", "", regex=False), errors="coerce"),
+    })
     df = (
-        pd.concat(blocks, ignore_index=True)
+        df.dropna(subset=["timestamp", "totalizer"])
         .drop_duplicates(subset=["timestamp"])
         .sort_values("timestamp")
         .reset_index(drop=True)
@@ -62,6 +105,8 @@ def load_flow_csv(path: Path | str) -> pd.DataFrame:
     df.loc[df["consumption"] < 0, "consumption"] = 0.0
     # fill first interval nan with 0
     df["consumption"] = df["consumption"].fillna(0.0)
+    # diff needs the float64 totalizer, but the per-interval amounts fit float32 and halve the bandwidth
+    df["consumption"] = df["consumption"].astype(np.float32)
 
     return df
 
@@ -69,72 +114,53 @@ def load_flow_csv(path: Path | str) -> pd.DataFrame:
 # header format example: '1. humidity (humidity), safe range: (30 to 70)'
 PARAM_RE = re.compile(r"^\s*\d+\.\s*(.+?)\s*,\s*Safe Range:\s*\(([^)]+)\)\s*$", re.I)
 
-def _parse_safe_range(text: str) -> Tuple[Optional[float], Optional[float]]:
-    # expects 'a to b'
-    if not isinstance(text, str):
-        return (None, None)
-    parts = text.split("to")
-    if len(parts) != 2:
-        return (None, None)
-    try:
-        return (float(parts[0].strip()), float(parts[1].strip()))
-    except Exception:
-        return (None, None)
-
 def load_quality_csv(path: Path | str) -> pd.DataFrame:
     """
     Quality CSV is grouped by parameter blocks:
       "<n>. NAME (CODE), Safe Range: (a to b)"
       "Date | Time | Value"
       rows...
-    Returns tidy: [timestamp, parameter, value, safe_min, safe_max]
+    Returns tidy: [timestamp, parameter (category), value, safe_min, safe_max (float32), in_range]
     """
-    raw = pd.read_csv(path, dtype=str).fillna("")
-    rows = raw.values.tolist()
-
-    out = []
-    current_param = None
-    safe_min = safe_max = None
-    in_table = False
-
-    for r in rows:
-        cells = [str(x).strip() for x in r if str(x).strip() != ""]
-        if not cells:
-            continue
-
-        # param header?
-        m = PARAM_RE.match(cells[0])
-        if m:
-            current_param = m.group(1).strip()
-            safe_min, safe_max = _parse_safe_range(m.group(2).strip())
-            in_table = False
-            continue
-
-        # table header?
-        if current_param and len(cells) >= 3 and cells[0].lower() == "date" and cells[1].lower() == "time":
-            in_table = True
-            continue
-
-        # table row
-        if in_table and current_param:
-            # expect [date, time, value]
-            if len(cells) < 3:
-                continue
-            date_str, time_str, val_str = cells[0], cells[1], cells[2]
-            ts = pd.to_datetime(f"{date_str} {time_str}", dayfirst=True, errors="coerce")
-            if pd.isna(ts):
-                continue
-            val = pd.to_numeric(val_str.replace(",", ""), errors="coerce")
-            out.append({
-                "timestamp": ts.tz_localize(TZ, nonexistent="shift_forward", ambiguous="NaT"),
-                "parameter": current_param,
-                "value": val,
-                "safe_min": safe_min,
-                "safe_max": safe_max
-            })
-
-    if not out:
-        return pd.DataFrame(columns=["timestamp", "parameter", "value", "safe_min", "safe_max"])
-
-    df = pd.DataFrame(out).dropna(subset=["timestamp"]).sort_values(["parameter", "timestamp"]).reset_index(drop=True)
+    raw = _read_raw_csv(path)
+    c0, c1, c2 = (raw.iloc[:, i].str.strip() for i in range(3))
+
+    # param headers split the file into blocks; block 0 is anything before the first header
+    # pattern string + flags, not the compiled regex: pandas 2.2's arrow string match only takes str
+    is_param = c0.str.match(PARAM_RE.pattern, flags=PARAM_RE.flags)
+    block = is_param.cumsum()
+
+    # data rows follow the "Date | Time | Value" header inside each block
+    is_table_hdr = (c0.str.lower() == "date") & (c1.str.lower() == "time")
+    in_table = is_table_hdr.groupby(block).cumsum() > 0
+    keep = (
+        in_table & ~is_table_hdr & ~is_param & (block > 0)
+        & (c0 != "") & (c1 != "") & (c2 != "")
+    )
+
+    cols = ["timestamp", "parameter", "value", "safe_min", "safe_max"]
+    if not is_param.any() or not keep.any():
+        return _empty(timestamp=f"datetime64[ns, {TZ}]", parameter="category", value=np.float32,
+                      safe_min=np.float32, safe_max=np.float32, in_range=bool)
+
+    # per-block metadata: name + safe range 'a to b' (both bounds nan unless exactly one 'to' and two numbers)
+    hdr = c0[is_param].str.extract(PARAM_RE.pattern, flags=PARAM_RE.flags)
+    bounds = (hdr[1].str.split("to", expand=True).reindex(columns=[0, 1])
+                .apply(lambda s: pd.to_numeric(s.str.strip(), errors="coerce")))
+    ok = (hdr[1].str.count("to") == 1) & bounds.notna().all(axis=1)
+    meta = pd.DataFrame({
+        "parameter": hdr[0].str.strip().to_numpy(),
+        "safe_min": bounds[0].where(ok).to_numpy(dtype=float),
+        "safe_max": bounds[1].where(ok).to_numpy(dtype=float),
+    }, index=block[is_param].to_numpy())
+    df = meta.reindex(block[keep].to_numpy()).reset_index(drop=True)
+    df["timestamp"] = _parse_timestamps(c0[keep], c1[keep]).array
+    df["value"] = pd.to_numeric(c2[keep].str.replace(",", ""), errors="coerce").array
+    df = df[cols].dropna(subset=["timestamp"]).sort_values(["parameter", "timestamp"]).reset_index(drop=True)
+    # ~10 distinct names repeated per reading: categorical keeps int codes instead of strings
+    df["parameter"] = df["parameter"].astype("category")
+    # computed once here; analytics/alerts reuse it instead of re-comparing
+    df["in_range"] = in_range(*(df[c].to_numpy(dtype=float) for c in ("value", "safe_min", "safe_max")))
+    # float32 after the range check, so borderline readings compare at full precision
+    df = df.astype({c: np.float32 for c in ("value", "safe_min", "safe_max")})
     return df
@@ -1,36 +1,107 @@
+# Data contract: load_all is cached with st.cache_resource, so every rerun gets the *same*
+# flow_df / quality_df / quality_meta objects (no per-rerun copy or output hashing). Never mutate
+# them in place -- slice, or .copy() before assigning columns.
+import io
 import os
+import zipfile
 from pathlib import Path
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 
 from src.parsers import load_flow_csv, load_quality_csv
 from src.analytics import (
     flow_daily, flow_shift_aggregates, flow_heatmap_hour_dow,
     quality_daily_compliance, quality_breach_events,
-    seasonal_rollups, humidity_vs_flow_daily
+    seasonal_rollups, humidity_vs_flow_daily, add_time_parts
 )
-from src.ask import ensure_ollama_available, ask_ollama, plan_query
+from src._fast import lttb_indices
+from src.ask import ensure_ollama_available, ask_ollama_stream, plan_query
 from src.alerts import flow_anomalies, quality_latest_breaches, simple_recommendations  # alerts import
 
 DATA_DIR = Path("data")
 TZ = "Asia/Kolkata"
+DOW_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]  # dow 0=mon, as in src.analytics
+
+# chart helpers: WebGL (canvas) traces fed with numpy arrays instead of SVG px figures
+def _split(df: pd.DataFrame, color: str | None):
+    if color is None:
+        return [(None, df)]
+    return [(str(name), d) for name, d in df.groupby(color, observed=True, sort=True)]
+
+MAX_POINTS = 2000  # per trace; ~ chart width in pixels
+
+def _downsample(d: pd.DataFrame, x: str, y: str, max_points: int) -> pd.DataFrame:
+    """LTTB-downsample long series server-side so only ~max_points go over the websocket"""
+    if len(d) <= max_points:
+        return d
+    xs = d[x]
+    if pd.api.types.is_datetime64_any_dtype(xs):
+        xn = xs.astype("int64").to_numpy(dtype=float)
+    elif pd.api.types.is_numeric_dtype(xs):
+        xn = xs.to_numpy(dtype=float)
+    else:
+        xn = np.arange(len(d), dtype=float)
+    return d.iloc[lttb_indices(xn, d[y].to_numpy(dtype=float), max_points)]
+
+def line_gl(df: pd.DataFrame, x: str, y: str, title: str, color: str | None = None,
+            max_points: int = MAX_POINTS) -> go.Figure:
+    fig = go.Figure([
+        go.Scattergl(x=d[x].to_numpy(), y=d[y].to_numpy(), mode="lines", name=name)
+        for name, d in ((n, _downsample(d, x, y, max_points)) for n, d in _split(df, color))
+    ])
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y, showlegend=color is not None, legend_title_text=color)
+    return fig
+
+def bar_chart(df: pd.DataFrame, x: str, y: str, title: str, color: str | None = None) -> go.Figure:
+    fig = go.Figure([go.Bar(x=d[x].to_numpy(), y=d[y].to_numpy(), name=name) for name, d in _split(df, color)])
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y, barmode="group",
+                      showlegend=color is not None, legend_title_text=color)
+    return fig
+
+def _trendline(x: np.ndarray, y: np.ndarray):
+    """least-squares line endpoints (xs, ys) over the finite pairs; None if fewer than two"""
+    ok = np.isfinite(x) & np.isfinite(y)
+    if ok.sum() < 2:
+        return None
+    m, b = np.polyfit(x[ok], y[ok], 1)
+    xs = np.array([x[ok].min(), x[ok].max()])
+    return xs, m * xs + b
+
+def scatter_trend_gl(df: pd.DataFrame, x: str, y: str, title: str) -> go.Figure:
+    """markers plus a least-squares line (np.polyfit) in place of px trendline="ols" """
+    xv = df[x].to_numpy(dtype=float)
+    yv = df[y].to_numpy(dtype=float)
+    fig = go.Figure(go.Scattergl(x=xv, y=yv, mode="markers", name=y))
+    line = _trendline(xv, yv)
+    if line is not None:
+        fig.add_trace(go.Scattergl(x=line[0], y=line[1], mode="lines", name="OLS trend"))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig
 
 st.set_page_config(page_title="Water Analytics (Prototype)", layout="wide")
 st.title("Water Management Analytics — Prototype")
 
-# ollama check
-with st.status("Checking Ollama…", expanded=False):
+# ollama check: probed once per session (successes shared across sessions for 60s). a failure is
+# remembered in session_state, so reruns skip the http call and only the assistant is disabled
+# until the user retries from there
+@st.cache_resource(ttl=60, show_spinner=False)
+def _ollama_info() -> dict:
+    return ensure_ollama_available()
+
+if "ollama_ok" not in st.session_state:
     try:
-        info = ensure_ollama_available()
-        st.success(f"Ollama OK — {info}")
+        st.session_state["ollama_info"] = _ollama_info()
+        st.session_state["ollama_ok"] = True
     except Exception as e:
-        st.error(
-            "Ollama server not reachable. "
-            "Make sure `ollama serve` is running and OLLAMA_URL/OLLAMA_MODEL are set.\n\n"
-            f"Details: {e}"
-        )
-        st.stop()
+        st.session_state["ollama_ok"] = False
+        st.session_state["ollama_error"] = str(e)
+if st.session_state["ollama_ok"]:
+    st.caption(f"Ollama OK — {st.session_state['ollama_info']}")
+else:
+    st.warning("Ollama server not reachable; the assistant is disabled, the analytics views still work.")
 
 # load data
 flow_path = DATA_DIR / "water_flow_data.csv"
@@ -40,49 +111,154 @@ if not flow_path.exists() or not qual_path.exists():
     st.error("CSV files missing in ./data. Expected water_flow_data.csv and water_quality_data.csv.")
     st.stop()
 
-@st.cache_data(show_spinner=False)
+@st.cache_resource(show_spinner=False)
 def load_all(flow_p: Path, qual_p: Path):
-    flow = load_flow_csv(flow_p)
-    qual = load_quality_csv(qual_p)
-    return flow, qual
-
-flow_df, quality_df = load_all(flow_path, qual_path)
-
-# tabs
-tabs = st.tabs([
+    flow, qual = load_flow_csv(flow_p), load_quality_csv(qual_p)
+    # both frames timestamp-sorted so time windows are searchsorted slices, not full-length masks
+    # (flow already is; quality comes back grouped by parameter, which every consumer regroups anyway)
+    qual = qual.sort_values("timestamp", kind="stable", ignore_index=True)
+    # integer day/hour/dow/month columns, computed once; the analytics reuse them on every rerun
+    flow, qual = add_time_parts(flow), add_time_parts(qual)
+    # per-parameter constants: {parameter: {"safe_min", "safe_max"}}, in sorted parameter order
+    meta = qual.groupby("parameter", observed=True)[["safe_min", "safe_max"]].first().to_dict(orient="index")
+    return flow, qual, meta
+
+flow_df, quality_df, quality_meta = load_all(flow_path, qual_path)
+
+# cached analytics: reruns (widget changes, tab switches) reuse results instead of regrouping.
+# keyed by a cheap frame fingerprint rather than hashing every cell.
+def _frame_key(d: pd.DataFrame):
+    ts = d["timestamp"] if "timestamp" in d.columns and len(d) else None
+    return (len(d), tuple(d.columns), None if ts is None else (ts.iloc[0], ts.iloc[-1]))
+
+_cache = st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _frame_key})
+
+@_cache
+def _flow_daily(df): return flow_daily(df)
+@_cache
+def _flow_shift_aggregates(df): return flow_shift_aggregates(df)
+@_cache
+def _flow_heatmap_hour_dow(df): return flow_heatmap_hour_dow(df)
+@_cache
+def _quality_daily_compliance(df): return quality_daily_compliance(df)
+@_cache
+def _quality_breach_events(df): return quality_breach_events(df)
+@_cache
+def _seasonal_rollups(flow, qual): return seasonal_rollups(flow, qual)
+@_cache
+def _humidity_vs_flow_daily(flow, qual, name): return humidity_vs_flow_daily(flow, qual, name)
+@_cache
+def _flow_anomalies(df, window): return flow_anomalies(df, window=window)
+@_cache
+def _quality_latest_breaches(df): return quality_latest_breaches(df)
+
+# download payloads: serialized once per result instead of on every rerun.
+# hashed by content (results are small), since e.g. per-parameter slices share length and columns
+@st.cache_data(show_spinner=False)
+def _csv_bytes(df: pd.DataFrame, index: bool = False) -> bytes:
+    return df.to_csv(index=index).encode("utf-8")
+
+# llm round-trips cached per question: the key is the normalized text, while the model sees the
+# original wording (underscore args are not hashed by st.cache_data)
+def _norm_question(q: str) -> str:
+    return " ".join(q.lower().split())
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _plan(key: str, _q: str) -> dict:
+    return plan_query(_q)
+
+# text answers are streamed, so they can't go through st.cache_data; finished replies are kept
+# here instead (the whole dict expires after an hour)
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _answers() -> dict:
+    return {}
+
+def _recent_anomalies(flow: pd.DataFrame, win: int = 24) -> pd.DataFrame:
+    """
+    anomaly scores for the last 24h only. the slice starts 2*(win-1) readings early as warm-up:
+    the mad is a rolling median of residuals that are themselves rolling medians
+    """
+    ts = flow["timestamp"]
+    i = ts.searchsorted(ts.iloc[-1] - pd.Timedelta(hours=24))
+    s = max(0, i - 2 * (win - 1))
+    return _flow_anomalies(flow.iloc[s:], window=win).iloc[i - s:]
+
+def _export_frames(flow: pd.DataFrame, qual: pd.DataFrame):
+    """(file name, table, write index) for every full-history export offered in the views"""
+    out = []
+    if not flow.empty:
+        out += [
+            ("flow_daily.csv", _flow_daily(flow), False),
+            ("flow_shift.csv", _flow_shift_aggregates(flow), False),
+            ("flow_heatmap_hour_dow.csv", _flow_heatmap_hour_dow(flow), True),
+            ("flow_anomalies_24h.csv", _recent_anomalies(flow), False),
+        ]
+    if not qual.empty:
+        out += [
+            ("quality_daily_compliance.csv", _quality_daily_compliance(qual), False),
+            ("quality_breach_events.csv", _quality_breach_events(qual), False),
+            ("quality_breaches_24h.csv", _quality_latest_breaches(qual), False),
+        ]
+    out.append(("humidity_vs_flow_daily.csv", _humidity_vs_flow_daily(flow, qual, "HUMIDITY (HUMIDITY)")[0], False))
+    return out
+
+@_cache
+def _export_zip(flow, qual) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, d, index in _export_frames(flow, qual):
+            z.writestr(name, _csv_bytes(d, index))
+    return buf.getvalue()
+
+# one zip of every export, only built on request so reruns never touch views that aren't open
+with st.sidebar:
+    st.markdown("**Export**")
+    if st.button("Prepare all exports (zip)"):
+        st.session_state["export_zip"] = _export_zip(flow_df, quality_df)
+    if "export_zip" in st.session_state:
+        st.download_button("Download all (zip)", data=st.session_state["export_zip"],
+                           file_name="exports.zip", mime="application/zip")
+
+# views: a radio instead of st.tabs, because streamlit runs every tab body on each rerun;
+# with the radio only the selected view's analytics execute
+VIEWS = [
     "Overview",
     "Flow Analytics",
     "Quality & Compliance",
     "Seasonal & Weather Impact",
     "Alerts & Recommendations",
     "Ask the Assistant"
-])
+]
+view = st.radio("View", VIEWS, horizontal=True, label_visibility="collapsed")
 
 # overview
-with tabs[0]:
+if view == VIEWS[0]:
     st.subheader("Overview")
     c1, c2, c3, c4 = st.columns(4)
 
     if not flow_df.empty:
-        today = pd.Timestamp.now(tz=TZ).date()
-        last7 = pd.Timestamp.now(tz=TZ) - pd.Timedelta(days=7)
-        total_today = flow_df[flow_df["timestamp"].dt.date == today]["consumption"].sum()
-        total_7 = flow_df[flow_df["timestamp"] >= last7]["consumption"].sum()
+        now = pd.Timestamp.now(tz=TZ)
+        today = now.normalize()
+        ts = flow_df["timestamp"]
+        lo_today, hi_today, lo_7 = ts.searchsorted([today, today + pd.Timedelta(days=1), now - pd.Timedelta(days=7)])
+        # float32 storage; sum in float64
+        total_today = flow_df["consumption"].iloc[lo_today:hi_today].astype(np.float64).sum()
+        total_7 = flow_df["consumption"].iloc[lo_7:].astype(np.float64).sum()
         c1.metric("Total Consumption (Today)", f"{total_today:,.2f}")
         c2.metric("Total Consumption (Last 7d)", f"{total_7:,.2f}")
 
-        daily = flow_daily(flow_df)
-        fig = px.line(daily, x="date", y="total_consumption", title="Daily Total Consumption")
+        daily = _flow_daily(flow_df)
+        fig = line_gl(daily, x="date", y="total_consumption", title="Daily Total Consumption")
         st.plotly_chart(fig, use_container_width=True)
         st.download_button(
             "Download daily totals (CSV)",
-            data=daily.to_csv(index=False).encode("utf-8"),
+            data=_csv_bytes(daily),
             file_name="flow_daily.csv",
             mime="text/csv"
         )
 
     if not quality_df.empty:
-        comp = quality_daily_compliance(quality_df)
+        comp = _quality_daily_compliance(quality_df)
         if not comp.empty:
             latest_day = comp["date"].max()
             latest = comp[comp["date"] == latest_day]
@@ -90,7 +266,7 @@ with tabs[0]:
             c3.metric("Avg % In Range (Latest Day)", f"{avg_comp:,.1f}%")
             st.download_button(
                 "Download daily compliance (CSV)",
-                data=comp.to_csv(index=False).encode("utf-8"),
+                data=_csv_bytes(comp),
                 file_name="quality_daily_compliance.csv",
                 mime="text/csv"
             )
@@ -98,73 +274,76 @@ with tabs[0]:
     c4.metric("Timezone", TZ)
 
 # flow analytics
-with tabs[1]:
+if view == VIEWS[1]:
     st.subheader("Flow Analytics")
     if flow_df.empty:
         st.info("No flow data parsed.")
     else:
-        daily = flow_daily(flow_df)
+        daily = _flow_daily(flow_df)
         st.plotly_chart(
-            px.line(daily, x="date", y="total_consumption", title="Daily Total Consumption"),
+            line_gl(daily, x="date", y="total_consumption", title="Daily Total Consumption"),
             use_container_width=True
         )
 
-        shift = flow_shift_aggregates(flow_df)
+        shift = _flow_shift_aggregates(flow_df)
         st.plotly_chart(
-            px.bar(shift, x="date", y="total_consumption", color="shift", barmode="group",
-                   title="Shift-wise Consumption"),
+            bar_chart(shift, x="date", y="total_consumption", color="shift", title="Shift-wise Consumption"),
             use_container_width=True
         )
 
-        heat = flow_heatmap_hour_dow(flow_df)  # pivot
-        st.write("**Hour × Day-of-Week (mean consumption)**")
-        st.dataframe(heat.style.format("{:.2f}"), use_container_width=True)
+        heat = _flow_heatmap_hour_dow(flow_df)  # pivot, cached
+        # one heatmap trace instead of a per-cell styled html table
+        st.plotly_chart(
+            px.imshow(heat.to_numpy(), x=heat.columns.tolist(), y=[DOW_NAMES[d] for d in heat.index],
+                      labels=dict(x="hour", y="day", color="mean consumption"),
+                      text_auto=".2f", aspect="auto", title="Hour × Day-of-Week (mean consumption)"),
+            use_container_width=True
+        )
 
         # exports
         c1, c2, c3 = st.columns(3)
         c1.download_button(
             "flow_daily.csv",
-            data=daily.to_csv(index=False).encode("utf-8"),
+            data=_csv_bytes(daily),
             file_name="flow_daily.csv",
             mime="text/csv"
         )
         c2.download_button(
             "flow_shift.csv",
-            data=shift.to_csv(index=False).encode("utf-8"),
+            data=_csv_bytes(shift),
             file_name="flow_shift.csv",
             mime="text/csv"
         )
         c3.download_button(
             "flow_heatmap_hour_dow.csv",
-            data=heat.to_csv().encode("utf-8"),
+            data=_csv_bytes(heat, index=True),
             file_name="flow_heatmap_hour_dow.csv",
             mime="text/csv"
         )
 
 # quality and compliance
-with tabs[2]:
+if view == VIEWS[2]:
     st.subheader("Quality & Compliance")
     if quality_df.empty:
         st.info("No quality data parsed.")
     else:
-        params = sorted(quality_df["parameter"].dropna().unique().tolist())
-        param = st.selectbox("Parameter", params, index=0)
-        qsel = quality_df[quality_df["parameter"] == param].copy()
-        if not qsel.empty:
-            st.caption(f"Safe range: {qsel['safe_min'].iloc[0]} to {qsel['safe_max'].iloc[0]}")
-            st.plotly_chart(
-                px.line(qsel, x="timestamp", y="value", title=f"{param} over time"),
-                use_container_width=True
-            )
+        param = st.selectbox("Parameter", list(quality_meta), index=0)
+        st.caption(f"Safe range: {quality_meta[param]['safe_min']:g} to {quality_meta[param]['safe_max']:g}")
+        # every listed parameter has readings; slice only for the plot
+        qsel = quality_df[quality_df["parameter"] == param]
+        st.plotly_chart(
+            line_gl(qsel, x="timestamp", y="value", title=f"{param} over time"),
+            use_container_width=True
+        )
 
-        comp = quality_daily_compliance(quality_df)
+        comp = _quality_daily_compliance(quality_df)
         st.plotly_chart(
-            px.bar(comp[comp["parameter"] == param], x="date", y="pct_in_range",
-                   title=f"{param} — Daily % In Range"),
+            bar_chart(comp[comp["parameter"] == param], x="date", y="pct_in_range",
+                      title=f"{param} — Daily % In Range"),
             use_container_width=True
         )
 
-        breaches = quality_breach_events(quality_df)
+        breaches = _quality_breach_events(quality_df)
         st.write("**Breach Events**")
         st.dataframe(breaches, use_container_width=True, height=260)
 
@@ -172,49 +351,49 @@ with tabs[2]:
         c1, c2 = st.columns(2)
         c1.download_button(
             "quality_daily_compliance.csv",
-            data=comp.to_csv(index=False).encode("utf-8"),
+            data=_csv_bytes(comp),
             file_name="quality_daily_compliance.csv",
             mime="text/csv"
         )
         c2.download_button(
             "quality_breach_events.csv",
-            data=breaches.to_csv(index=False).encode("utf-8"),
+            data=_csv_bytes(breaches),
             file_name="quality_breach_events.csv",
             mime="text/csv"
         )
 
 # seasonal and weather impact
-with tabs[3]:
+if view == VIEWS[3]:
     st.subheader("Seasonal & Weather Impact (Humidity as weather)")
-    roll = seasonal_rollups(flow_df, quality_df)
+    roll = _seasonal_rollups(flow_df, quality_df)
     c1, c2 = st.columns(2)
     if not roll["flow_month"].empty:
         c1.plotly_chart(
-            px.bar(roll["flow_month"], x="month", y="total_consumption", title="Monthly Total Consumption"),
+            bar_chart(roll["flow_month"], x="month", y="total_consumption", title="Monthly Total Consumption"),
             use_container_width=True
         )
     if not roll["quality_month"].empty:
         c2.plotly_chart(
-            px.box(quality_df.assign(month=quality_df["timestamp"].dt.month),
+            px.box(quality_df,
                    x="month", y="value", color="parameter", title="Monthly Distribution by Parameter"),
             use_container_width=True
         )
 
-    hum_df, corr = humidity_vs_flow_daily(flow_df, quality_df, "HUMIDITY (HUMIDITY)")
+    hum_df, corr = _humidity_vs_flow_daily(flow_df, quality_df, "HUMIDITY (HUMIDITY)")
     st.plotly_chart(
-        px.scatter(hum_df, x="humidity", y="total_consumption",
-                   trendline="ols", title=f"Daily Consumption vs Daily Mean Humidity (corr={corr})"),
+        scatter_trend_gl(hum_df, x="humidity", y="total_consumption",
+                         title=f"Daily Consumption vs Daily Mean Humidity (corr={corr})"),
         use_container_width=True
     )
     st.download_button(
         "humidity_vs_flow_daily.csv",
-        data=hum_df.to_csv(index=False).encode("utf-8"),
+        data=_csv_bytes(hum_df),
         file_name="humidity_vs_flow_daily.csv",
         mime="text/csv"
     )
 
 # alerts and recommendations
-with tabs[4]:
+if view == VIEWS[4]:
     st.subheader("Alerts & Recommendations")
 
     col1, col2 = st.columns(2)
@@ -222,19 +401,16 @@ with tabs[4]:
     # flow anomalies (last 24h)
     with col1:
         st.markdown("**Flow anomalies (last 24h)**")
-        an = flow_anomalies(flow_df, window=24)
-        if not an.empty:
-            end = an["timestamp"].max()
-            start = end - pd.Timedelta(hours=24)
-            recent = an[(an["timestamp"] >= start) & (an["timestamp"] <= end)]
-            flagged = recent[recent["anomaly"]][["timestamp", "consumption", "threshold"]]
+        if not flow_df.empty:
+            recent = _recent_anomalies(flow_df)
+            flagged = recent.loc[recent["anomaly"].to_numpy(), ["timestamp", "consumption", "threshold"]]
             if not flagged.empty:
                 st.dataframe(flagged, use_container_width=True, height=260)
             else:
                 st.success("No anomalies flagged in the last 24 hours.")
             st.download_button(
                 "flow_anomalies_24h.csv",
-                data=recent.to_csv(index=False).encode("utf-8"),
+                data=_csv_bytes(recent),
                 file_name="flow_anomalies_24h.csv",
                 mime="text/csv"
             )
@@ -244,12 +420,12 @@ with tabs[4]:
     # quality breaches (last 24h) and tips
     with col2:
         st.markdown("**Quality breaches (last 24h)**")
-        breaches_24h = quality_latest_breaches(quality_df)
+        breaches_24h = _quality_latest_breaches(quality_df)
         if not breaches_24h.empty:
             st.dataframe(breaches_24h, use_container_width=True, height=260)
             st.download_button(
                 "quality_breaches_24h.csv",
-                data=breaches_24h.to_csv(index=False).encode("utf-8"),
+                data=_csv_bytes(breaches_24h),
                 file_name="quality_breaches_24h.csv",
                 mime="text/csv"
             )
@@ -257,28 +433,39 @@ with tabs[4]:
             st.success("No quality breaches in the last 24 hours.")
 
     st.markdown("**Recommended actions**")
-    recs = simple_recommendations(breaches_24h if 'breaches_24h' in locals() else pd.DataFrame())
+    recs = simple_recommendations(breaches_24h)
     for r in recs:
         st.write("- " + r)
 
 # ask the assistant (ollama required)
-with tabs[5]:  # note: adjust index if the tab list changes
+if view == VIEWS[5]:
     st.subheader("Ask the Assistant")
     st.caption("Ask for charts or tables directly, for example: 'shift-wise consumption yesterday', "
                "'TDS compliance last 7 days', 'humidity impact this month'.")
+    if not st.session_state["ollama_ok"]:
+        st.error(
+            "Ollama server not reachable. "
+            "Make sure `ollama serve` is running and OLLAMA_URL/OLLAMA_MODEL are set.\n\n"
+            f"Details: {st.session_state['ollama_error']}"
+        )
+        if st.button("Retry"):
+            del st.session_state["ollama_ok"]  # re-probe on the next run
+            st.rerun()
+        st.stop()
     q = st.text_input("Your question", "")
 
     def _apply_lookback(df, days: int):
         if df.empty or not isinstance(days, int) or days <= 0:
             return df
-        end = df["timestamp"].max()
-        start = end - pd.Timedelta(days=days)
-        return df[(df["timestamp"] >= start) & (df["timestamp"] <= end)].copy()
+        # frames are timestamp-sorted (see load_all): the window is a tail slice
+        ts = df["timestamp"]
+        start = ts.iloc[-1] - pd.Timedelta(days=days)
+        return df.iloc[ts.searchsorted(start):]
 
     if st.button("Ask") and q.strip():
         try:
             with st.spinner("Planning…"):
-                plan = plan_query(q.strip())
+                plan = _plan(_norm_question(q), q.strip())
             st.caption("Plan:")
             st.code(plan, language="json")
 
@@ -293,30 +480,29 @@ with tabs[5]:  # note: adjust index if the tab list changes
             qdf = _apply_lookback(quality_df, lookback) if lookback else quality_df
 
             if action == "flow_shift":
-                data = flow_shift_aggregates(fdf)
+                data = _flow_shift_aggregates(fdf)
                 st.plotly_chart(
-                    px.bar(data, x="date", y="total_consumption", color="shift", barmode="group",
-                           title="Shift-wise Consumption"),
+                    bar_chart(data, x="date", y="total_consumption", color="shift", title="Shift-wise Consumption"),
                     use_container_width=True
                 )
-                st.dataframe(data.tail(60), use_container_width=True, height=280)
+                st.dataframe(data, use_container_width=True, height=280)
                 st.download_button(
                     "ask_flow_shift.csv",
-                    data=data.to_csv(index=False).encode("utf-8"),
+                    data=_csv_bytes(data),
                     file_name="ask_flow_shift.csv",
                     mime="text/csv"
                 )
 
             elif action == "flow_daily":
-                data = flow_daily(fdf)
+                data = _flow_daily(fdf)
                 st.plotly_chart(
-                    px.line(data, x="date", y="total_consumption", title="Daily Total Consumption"),
+                    line_gl(data, x="date", y="total_consumption", title="Daily Total Consumption"),
                     use_container_width=True
                 )
-                st.dataframe(data.tail(60), use_container_width=True, height=280)
+                st.dataframe(data, use_container_width=True, height=280)
                 st.download_button(
                     "ask_flow_daily.csv",
-                    data=data.to_csv(index=False).encode("utf-8"),
+                    data=_csv_bytes(data),
                     file_name="ask_flow_daily.csv",
                     mime="text/csv"
                 )
@@ -324,27 +510,27 @@ with tabs[5]:  # note: adjust index if the tab list changes
             elif action == "quality_compliance":
                 # default parameter if missing
                 if not param_name:
-                    params_list = sorted(qdf["parameter"].dropna().unique().tolist())
+                    params_list = qdf["parameter"].cat.remove_unused_categories().cat.categories.tolist()
                     param_name = params_list[0] if params_list else None
                 if not param_name:
                     st.warning("No parameters found in data.")
                 else:
-                    comp = quality_daily_compliance(qdf)
+                    comp = _quality_daily_compliance(qdf)
                     data = comp[comp["parameter"] == param_name]
                     st.plotly_chart(
-                        px.bar(data, x="date", y="pct_in_range", title=f"{param_name} — Daily % In Range"),
+                        bar_chart(data, x="date", y="pct_in_range", title=f"{param_name} — Daily % In Range"),
                         use_container_width=True
                     )
-                    st.dataframe(data.tail(60), use_container_width=True, height=280)
+                    st.dataframe(data, use_container_width=True, height=280)
                     st.download_button(
                         f"ask_compliance_{param_name}.csv",
-                        data=data.to_csv(index=False).encode("utf-8"),
+                        data=_csv_bytes(data),
                         file_name=f"ask_compliance_{param_name}.csv",
                         mime="text/csv"
                     )
 
             elif action == "breach_events":
-                data = quality_breach_events(qdf)
+                data = _quality_breach_events(qdf)
                 if param_name:
                     data = data[data["parameter"] == param_name]
                 if isinstance(min_dur, (int, float)) and not data.empty:
@@ -352,31 +538,34 @@ with tabs[5]:  # note: adjust index if the tab list changes
                 st.dataframe(data, use_container_width=True, height=360)
                 st.download_button(
                     f"ask_breaches_{param_name or 'all'}.csv",
-                    data=data.to_csv(index=False).encode("utf-8"),
+                    data=_csv_bytes(data),
                     file_name=f"ask_breaches_{param_name or 'all'}.csv",
                     mime="text/csv"
                 )
 
             elif action == "humidity_vs_flow":
-                hvf, corr = humidity_vs_flow_daily(fdf, qdf, "HUMIDITY (HUMIDITY)")
+                hvf, corr = _humidity_vs_flow_daily(fdf, qdf, "HUMIDITY (HUMIDITY)")
                 corr_txt = "None" if corr is None else f"{corr:.3f}"
                 st.plotly_chart(
-                    px.scatter(hvf, x="humidity", y="total_consumption",
-                               trendline="ols", title=f"Daily Consumption vs Daily Mean Humidity (corr={corr_txt})"),
+                    scatter_trend_gl(hvf, x="humidity", y="total_consumption",
+                                     title=f"Daily Consumption vs Daily Mean Humidity (corr={corr_txt})"),
                     use_container_width=True
                 )
                 st.dataframe(hvf, use_container_width=True, height=280)
                 st.download_button(
                     "ask_humidity_vs_flow.csv",
-                    data=hvf.to_csv(index=False).encode("utf-8"),
+                    data=_csv_bytes(hvf),
                     file_name="ask_humidity_vs_flow.csv",
                     mime="text/csv"
                 )
 
             else:
-                # fallback to text answer
-                answer = ask_ollama(q.strip())
-                st.write(answer)
+                # fallback to text answer, rendered token by token as ollama streams it
+                key, answers = _norm_question(q), _answers()
+                if key in answers:
+                    st.write(answers[key])
+                else:
+                    answers[key] = st.write_stream(ask_ollama_stream(q.strip()))
 
         except Exception as e:
             st.error(f"Failed to run LLM-driven analytics. Details: {e}")
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from src._fast import HAVE_NUMBA, rolling_median_mad, _rolling_median_mad
+
+# check the fused rolling median/mad kernel against pandas (python test_anomalies.py)
+def reference(x, w, minp):
+    s = pd.Series(x)
+    med = s.rolling(w, min_periods=minp).median()
+    mad = (s - med).abs().rolling(w, min_periods=minp).median()
+    return med.to_numpy(), mad.to_numpy()
+
+rng = np.random.default_rng(0)
+x = rng.gamma(2.0, 0.5, 2000).round(2)  # 2-decimal readings, so the windows hold ties
+x[rng.random(2000) < 0.05] = np.nan     # scattered gaps
+x[300:340] = np.nan                     # a gap longer than the window
+x[500:520] = 0.8                        # flat run (mad == 0)
+x[1500] = 25.0                          # spike
+
+kernels = [("python", _rolling_median_mad)] + ([("numba", rolling_median_mad)] if HAVE_NUMBA else [])
+cases = [(24, 6), (24, 24), (24, 1), (5, 3), (6, 6), (1, 1), (50, 12), (3000, 10)]
+for name, fn in kernels:
+    for w, minp in cases:
+        med, mad = fn(x, w, minp)
+        ref_med, ref_mad = reference(x, w, minp)
+        np.testing.assert_array_equal(med, ref_med, err_msg=f"{name} median, w={w} minp={minp}")
+        np.testing.assert_array_equal(mad, ref_mad, err_msg=f"{name} mad, w={w} minp={minp}")
+    print(name, "kernel matches pandas for", len(cases), "window/min_periods pairs")
+
+# all-nan and short inputs
+for name, fn in kernels:
+    med, mad = fn(np.full(10, np.nan), 4, 2)
+    assert np.isnan(med).all() and np.isnan(mad).all()
+    med, mad = fn(np.array([1.0, 2.0]), 24, 6)
+    assert np.isnan(med).all() and np.isnan(mad).all()
+
+if not HAVE_NUMBA:
+    print("numba not installed; only the python kernel was checked")
+print("OK")
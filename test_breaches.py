@@ -0,0 +1,46 @@
+from pathlib import Path
+from src.parsers import load_quality_csv
+from src.analytics import quality_breach_events
+
+# regression check for quality_breach_events on the bundled data (python test_breaches.py)
+qual_path = Path("data/water_quality_data.csv")
+
+qual = load_quality_csv(qual_path)
+events = quality_breach_events(qual)
+
+# reference: walk each parameter's readings in time order, cut a segment on every in/out-of-range flip
+def reference_events(q):
+    rows = []
+    for param, g in q.sort_values(["parameter", "timestamp"]).groupby("parameter", observed=True):
+        ok = ((g["value"] >= g["safe_min"]) & (g["value"] <= g["safe_max"])).tolist()
+        ts, vals = g["timestamp"].tolist(), g["value"]
+        i = 0
+        while i < len(ok):
+            j = i
+            while j + 1 < len(ok) and ok[j + 1] == ok[i]:
+                j += 1
+            if not ok[i]:
+                seg = vals.iloc[i:j + 1]
+                rows.append((str(param), ts[i], ts[j], j - i + 1, float(seg.min()), float(seg.max())))
+            i = j + 1
+    return rows
+
+got = [(str(p), s, e, int(n), float(lo), float(hi)) for p, s, e, n, lo, hi in
+       events[["parameter", "start", "end", "readings", "min_value", "max_value"]].itertuples(index=False)]
+assert got == reference_events(qual), "breach segments differ from the reference walk"
+
+# pinned numbers for the bundled file
+counts = {str(k): v for k, v in events.groupby("parameter", observed=True).size().items()}
+assert counts == {"ETP (TDS)": 41, "ETP (pH)": 66, "STP (BOD)": 34, "STP (COD)": 41,
+                  "STP (TDS)": 41, "STP (TSS)": 41, "STP (pH)": 61}, counts
+etp = events[events["parameter"] == "ETP (TDS)"].reset_index(drop=True)
+assert int(etp["readings"].sum()) == 147
+assert (str(etp.loc[0, "start"]), str(etp.loc[0, "end"]), int(etp.loc[0, "readings"])) == \
+    ("2025-06-01 12:00:00+05:30", "2025-06-01 13:15:00+05:30", 5)
+assert (str(etp.loc[40, "start"]), str(etp.loc[40, "end"]), int(etp.loc[40, "readings"])) == \
+    ("2025-06-29 22:00:00+05:30", "2025-06-29 22:45:00+05:30", 4)
+
+print("BREACHES ===")
+print(events.head(8))
+print("events:", len(events), "per parameter:", counts)
+print("OK")
@@ -1,4 +1,4 @@
-import os, requests
+import os, json, requests
 
 OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://127.0.0.1:11435/api/chat")
 MODEL = os.environ.get("OLLAMA_MODEL", "llama3.1")
@@ -9,14 +9,21 @@ payload = {
         {"role": "system", "content": "You are a helpful assistant."},
         {"role": "user", "content": "Reply with the single word: READY"}
     ],
-    "stream": False  # ask for single json response
+    "stream": True  # ndjson, one object per line, tokens as they are generated
 }
 
-r = requests.post(OLLAMA_URL, json=payload, timeout=60)
-r.raise_for_status()
-
-data = r.json()
-# prefer message.content; fallback to response
-content = (data.get("message") or {}).get("content") or data.get("response") or ""
 print("MODEL:", MODEL)
-print("REPLY:", content.strip())
+print("REPLY: ", end="", flush=True)
+# session like src.ask uses; closed on exit instead of leaving the socket to gc
+with requests.Session() as session:
+    with session.post(OLLAMA_URL, json=payload, timeout=60, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(chunk_size=None):
+            if not line:
+                continue
+            data = json.loads(line)
+            # prefer message.content; fallback to response
+            print((data.get("message") or {}).get("content") or data.get("response") or "", end="", flush=True)
+            if data.get("done"):
+                break
+print()
@@ -1,3 +1,4 @@
+import tempfile
 from pathlib import Path
 from src.parsers import load_flow_csv, load_quality_csv
 
@@ -16,3 +17,26 @@ print("\nQUALITY ===")
 print(qual.head(8))
 print("rows:", len(qual), "params:", sorted(qual["parameter"].unique().tolist()))
 print("time_range:", qual["timestamp"].min(), "→", qual["timestamp"].max())
+
+# ragged rows: hand-exported logs have uneven trailing commas; short rows must parse, not raise
+print("\nRAGGED ===")
+with tempfile.TemporaryDirectory() as tmp:
+    rf = Path(tmp) / "flow.csv"
+    rf.write_text("Location Name: Corporation Water,,,,\n"
+                  "Date,Time,Totalizer,,\n"
+                  "01/06/2025,06:00:00,530397.9,,\n"
+                  "01/06/2025,06:05:00,530398.17\n"
+                  "01/06/2025,06:10:00,530399.07,,\n")
+    rq = Path(tmp) / "quality.csv"
+    rq.write_text(" ,,,,\n"
+                  "\"1. HUMIDITY (HUMIDITY), Safe Range: (30 to 70)\",,,,\n"
+                  "Date,Time,Value,,\n"
+                  "01/06/2025,06:00:00,55\n"
+                  "01/06/2025,06:15:00,75,,\n")
+    f = load_flow_csv(rf)
+    q = load_quality_csv(rq)
+print(f)
+print(q)
+assert len(f) == 3 and [round(float(x), 2) for x in f["consumption"]] == [0.0, 0.27, 0.9]
+assert len(q) == 2 and q["value"].tolist() == [55.0, 75.0] and q["in_range"].tolist() == [True, False]
+print("ragged OK")